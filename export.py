@@ -0,0 +1,145 @@
+import json
+import numpy as np
+from pathlib import Path
+from numpy.lib.format import open_memmap
+
+from provenance import make_provenance, get_top_k, get_ranking
+
+# Layout of an export directory:
+#   metadata.json            scenario metadata, system names, shapes
+#   samples.npy              (samples, years) yearly returns
+#   start_dates.npy          (samples,) provenance: start date of each sample
+#   pct_below_ath.npy        (samples,) provenance: distance to the ATH at the start date
+#   seeds.npy                (samples,) provenance: generator seed of synthetic paths, -1 for historical
+#   balances.npy             (systems, years, samples) netto balance at end of year
+#   tax_payed.npy            (systems, years, samples) total tax actually payed up to the end of the year; Box 2:
+#                            VPB and box 2 tax payed on dividends and withdrawals
+#   latent_tax.npy           (systems, years, samples) tax still due on liquidation at the end of the year (balance
+#                            minus netto balance); Box 2: the latent VPB with kostprijswaardering and box 2 tax
+#   depletion.npy            (systems, samples) year in which the sample ran out of money by withdrawals, 0 = never
+# For switch scenarios the tax payed includes the tax payed in the first system, and at the switch.
+# Arrays are stored year-major per system, so a (system, year) slice is one contiguous block of samples.
+
+METADATA_FILE = "metadata.json"
+FORMAT_VERSION = 1
+
+
+def _write_series(filename, series: dict, systems, years, n_samples, dtype):
+    # Written year by year from the per-year results, without first stacking them into one matrix
+    out = open_memmap(filename, mode="w+", dtype=dtype, shape=(len(systems), years, n_samples))
+
+    for s, system in enumerate(systems):
+        for year in range(1, years + 1):
+            out[s, year - 1] = series[system][year]
+
+    out.flush()
+    del out
+
+
+def export_results(directory, balances: dict, taxes: dict, samples, provenance, metadata: dict, dtype=np.float64,
+                   depletion: dict = None):
+    """
+    balances: {system: {year: [...]}}, as returned by run_with_samples
+    taxes: {system: {"payed": {year: [...]}, "latent": {year: [...]}}}
+    provenance: per sample, see provenance.py
+    depletion: {system: [...]} depletion year per sample, see run_systems; None if no sample can be depleted
+    metadata: scenario settings, stored as-is in metadata.json
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    samples = np.asarray(samples)
+    n_samples, years = samples.shape
+    systems = list(balances.keys())
+
+    np.save(directory / "samples.npy", samples.astype(dtype, copy=False))
+    np.save(directory / "start_dates.npy", provenance["start_date"])
+    np.save(directory / "pct_below_ath.npy", provenance["pct_below_ath"])
+    np.save(directory / "seeds.npy", provenance["seed"])
+
+    _write_series(directory / "balances.npy", balances, systems, years, n_samples, dtype)
+    _write_series(directory / "tax_payed.npy", {k: taxes[k]["payed"] for k in systems}, systems, years, n_samples, dtype)
+    _write_series(directory / "latent_tax.npy", {k: taxes[k]["latent"] for k in systems}, systems, years, n_samples, dtype)
+
+    if depletion is None:
+        np.save(directory / "depletion.npy", np.zeros((len(systems), n_samples), dtype=np.int32))
+    else:
+        np.save(directory / "depletion.npy", np.stack([depletion[k] for k in systems]).astype(np.int32, copy=False))
+
+    with open(directory / METADATA_FILE, "w") as f:
+        json.dump({
+            "version": FORMAT_VERSION,
+            "systems": systems,
+            "years": years,
+            "samples": n_samples,
+            "dtype": np.dtype(dtype).name,
+            "scenario": metadata,
+        }, f, indent=2)
+
+
+class Results:
+    """
+    Exported results, memory-mapped: slicing only reads the requested part from disk.
+    """
+
+    def __init__(self, directory):
+        directory = Path(directory)
+
+        with open(directory / METADATA_FILE) as f:
+            self.metadata = json.load(f)
+
+        if self.metadata["version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported export version: {self.metadata['version']}")
+
+        self.systems = self.metadata["systems"]
+        self.years = self.metadata["years"]
+        self.scenario = self.metadata["scenario"]
+
+        self.samples = np.load(directory / "samples.npy", mmap_mode="r")
+        self.start_dates = np.load(directory / "start_dates.npy", mmap_mode="r")
+        self.pct_below_ath = np.load(directory / "pct_below_ath.npy", mmap_mode="r")
+        self.seeds = np.load(directory / "seeds.npy", mmap_mode="r")
+        self.balances = np.load(directory / "balances.npy", mmap_mode="r")
+        self.tax_payed = np.load(directory / "tax_payed.npy", mmap_mode="r")
+        self.latent_tax = np.load(directory / "latent_tax.npy", mmap_mode="r")
+        self.depletion = np.load(directory / "depletion.npy", mmap_mode="r")
+
+    def system_index(self, system) -> int:
+        return self.systems.index(system)
+
+    def balance(self, system, year=None):
+        """
+        Balances of one system: all years (years, samples), or the samples of one year (1-based, like SPANS)
+        """
+        balances = self.balances[self.system_index(system)]
+        return balances if year is None else balances[year - 1]
+
+    def provenance(self, indices=slice(None)):
+        """
+        Provenance of the given samples (all by default), see provenance.py
+        """
+        if not isinstance(indices, slice):
+            # a single sample gives a provenance array of length 1
+            indices = np.atleast_1d(indices)
+        return make_provenance(self.start_dates[indices], self.pct_below_ath[indices], self.seeds[indices])
+
+    def tail(self, system, year, k, worst=True):
+        """
+        Indices of the k worst (or best) samples of a system after `year` years, worst/best first.
+        Samples depleted by then are the worst, earliest first.
+        """
+        ranking = get_ranking(self.balance(system, year), self.depletion[self.system_index(system)], year)
+        return get_top_k(ranking, k, worst)
+
+    def as_dict(self) -> dict:
+        """
+        Balances in the format used by main.py and graphs.py: {system: {year: [...]}}
+        """
+        return {
+            system: {year: self.balances[s, year - 1] for year in range(1, self.years + 1)}
+            for s, system in enumerate(self.systems)
+        }
+
+
+def load_results(directory) -> Results:
+    return Results(directory)
@@ -1,4 +1,5 @@
 import argparse
+import sys
 import pandas as pd
 import numpy as np
 
@@ -8,12 +9,26 @@ from tax_systems.fixed_interest import FixedInterest
 from tax_systems.box3_2026 import Box3_2026
 from tax_systems.box3_2028 import Box3_2028
 from tax_systems.box2 import Box2
+from tax_systems.cash_flow import CashFlow
 from graphs import *
+from export import export_results
+from provenance import make_provenance, get_top_k, get_ranking, describe
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
 
 # customize settings below
 START_BALANCE = 100_000
 SPANS = [5, 10, 20, 30, 50, 75]
 
+# Max number of samples rerun in float64 to measure the error of float32 mode
+ERROR_REFERENCE_SAMPLES = 10_000
+
+# Number of worst paths shown per system in the reports
+TAIL_PATHS = 3
+
 def rnd(x):
     return int(round(x, 0))
 
@@ -57,7 +72,7 @@ def add_ath_distance(df, price_col="Price Inc Dividend"):
 
 def get_statistics(balances, start, years):
 
-    balances = sorted(balances)
+    balances = np.sort(np.asarray(balances, dtype=np.float64))
     n = len(balances)
 
     stats = {
@@ -74,6 +89,31 @@ def get_statistics(balances, start, years):
 
     return stats
 
+def get_tail_table(balances: dict, samples, provenance, year, depletion=None, k=TAIL_PATHS, worst=True):
+    """
+    The k worst (or best) paths per system after `year` years, with their provenance
+    depletion: {system: [...]} year in which each path ran out of money, see run_systems; depleted paths rank worst
+    """
+    samples = np.asarray(samples)
+    first_years = min(5, year)
+    tables = []
+
+    for name, balance in balances.items():
+        system_depletion = None if depletion is None else depletion[name]
+        indices = get_top_k(get_ranking(balance[year], system_depletion, year), k, worst)
+
+        table = describe(provenance, indices)
+        table.insert(0, "Name", name)
+        if system_depletion is not None:
+            table["depleted"] = [int(d) if 0 < d <= year else "" for d in system_depletion[indices]]
+        table["CAGR*"] = [get_period_yield(START_BALANCE, balance[year][i], year) for i in indices]
+        # Sequence of returns: market return over the first years of the path
+        growth = np.prod(1 + samples[indices, :first_years].astype(np.float64), axis=1)
+        table[f"first {first_years} yrs*"] = np.round((growth ** (1 / first_years) - 1) * 100, 2)
+        tables.append(table)
+
+    return pd.concat(tables, ignore_index=True)
+
 def winrate_matrix(balances: dict, year):
     keys = list(balances.keys())
     n = len(balances[keys[0]][year])
@@ -86,17 +126,38 @@ def winrate_matrix(balances: dict, year):
                 matrix.loc[kx, ky] = np.nan
                 continue
 
-            wins = 0
-            for i in range(n):
-                if balances[kx][year][i] > balances[ky][year][i]:
-                    wins += 1
+            wins = np.count_nonzero(np.asarray(balances[kx][year]) > np.asarray(balances[ky][year]))
 
             matrix.loc[kx, ky] = round(100 * wins / n, 1)
 
     return matrix
 
-def get_rolling_returns(df, years, ath_percentage=100):
-    out = []
+def get_yearly_returns(df, start_date, years):
+    start_price = df.loc[start_date, "Price Inc Dividend"]
+    yearly = np.empty(years)
+
+    for y in range(1, years + 1):
+        target = start_date + pd.DateOffset(years=y)
+
+        if target in df.index:
+            end = df.loc[target, "Price Inc Dividend"]
+        else:
+            idx = df.index.get_indexer([target], method="nearest")[0]
+            end = df.iloc[idx]["Price Inc Dividend"]
+
+        year_return = (end / start_price) - 1
+        yearly[y - 1] = year_return
+        start_price = end
+
+    assert(end == df.loc[start_date + pd.DateOffset(years=years), "Price Inc Dividend"])
+
+    return yearly
+
+def get_rolling_returns(df, years, ath_percentage=100, dtype=np.float64):
+    """
+    Returns the (samples, years) matrix of yearly returns, stored as dtype, and the provenance per sample
+    """
+    start_dates = []
 
     dates = df.index
     max_date = dates.max()
@@ -112,64 +173,220 @@ def get_rolling_returns(df, years, ath_percentage=100):
         if df.loc[start_date, "Pct Below ATH"] > (ath_percentage / 100):
             continue
 
-        start_price = df.loc[start_date, "Price Inc Dividend"]
-        yearly = []
+        start_dates.append(start_date)
+
+    # Filled row by row, so no full float64 copy is made
+    samples = np.empty((len(start_dates), years), dtype=dtype)
+    for i, start_date in enumerate(start_dates):
+        samples[i] = get_yearly_returns(df, start_date, years)
 
-        for y in range(1, years + 1):
-            target = start_date + pd.DateOffset(years=y)
+    pct_below_ath = df.loc[start_dates, "Pct Below ATH"].to_numpy()
 
-            if target in df.index:
-                end = df.loc[target, "Price Inc Dividend"]
-            else:
-                idx = df.index.get_indexer([target], method="nearest")[0]
-                end = df.iloc[idx]["Price Inc Dividend"]
+    return samples, make_provenance(start_dates, pct_below_ath)
 
-            year_return = (end / start_price) - 1
-            yearly.append(year_return)
-            start_price = end
+def get_reference_samples(df, provenance, years):
+    """
+    float64 returns of every `step`-th sample, as reference for the float32 error. Returns step and samples.
+    """
+    step = max(1, len(provenance) // ERROR_REFERENCE_SAMPLES)
+    start_dates = pd.to_datetime(provenance["start_date"][::step])
 
-        assert(end == df.loc[end_date, "Price Inc Dividend"])
+    return step, np.array([get_yearly_returns(df, start_date, years) for start_date in start_dates])
 
-        out.append(yearly)
+def expand(values, active, n, dtype, fill=0.0):
+    # Values of the active samples, back in the (n,) layout; dropped samples get `fill`
+    if active is None:
+        return values.astype(dtype, copy=False)
 
+    out = np.array(np.broadcast_to(fill, n), dtype=dtype)
+    out[active] = values
     return out
 
-def run_with_samples(system_cls, start_amount, samples):
+def record_taxes(taxes, year, system, active, n, dtype=np.float64, offset=None):
+    # payed: total tax payed, latent: tax due on liquidation at the end of the year
+    # offset: total tax payed in a previous system, per sample
+    if taxes is None:
+        return
+
+    m = n if active is None else len(active)
+    payed = np.broadcast_to(system.get_tax_payed(), m)
+    if offset is not None:
+        payed = payed + (offset if active is None else offset[active])
+
+    # Copy: the tax totals are updated in place by the systems
+    # dropped samples keep their last total, and have nothing left to tax
+    series = taxes.setdefault("payed", {})
+    series[year] = expand(payed, active, n, dtype, series.get(year - 1, 0.0)).copy()
+    taxes.setdefault("latent", {})[year] = expand(np.broadcast_to(system.get_latent_tax(), m), active, n, dtype).copy()
+
+def run_batch_years(system, samples, years, balances, taxes=None, dtype=np.float64, flow=None, active=None, tax_offset=None,
+                    depletion=None):
+    """
+    Run `system` (one balance per active sample) over `years` (0-based).
+    flow: compiled cash-flow, applied at the start of each year; depleted samples are dropped from the system.
+    active: indices of the samples in the system, None if all
+    tax_offset: total tax payed in a previous system, added to the recorded tax payed
+    depletion: if given, (samples,) filled with the year (1-based) in which a sample ran out of money
+    Returns the active samples, and the flow of the active samples.
+    """
+    n = len(samples)
+
+    for year in years:
+        if flow is not None:
+            system.do_cash_flow(flow.amount[year] + flow.percentage[year] * system.netto_balance)
+
+            depleted = system.balance <= 0
+            if depleted.any():
+                keep = ~depleted
+                indices = np.arange(n) if active is None else active
+                if depletion is not None:
+                    depletion[indices[depleted]] = year + 1
+
+                system.select(keep)
+                flow = flow.select(keep)
+                active = indices[keep]
+
+        returns = samples[:, year] if active is None else samples[active, year]
+        system.do_year(returns.astype(np.float64))
+
+        balances[year + 1] = expand(system.netto_balance, active, n, dtype)
+        record_taxes(taxes, year + 1, system, active, n, dtype, tax_offset)
+
+    return active, flow
+
+def run_with_samples(system_cls, start_amount, samples, taxes=None, dtype=np.float64, cash_flow=None, depletion=None):
+    """
+    samples: (samples, years) yearly returns, can be stored as float32
+    taxes: if given, filled with the total tax payed and the latent tax per year: {"payed": {year: [...]}, "latent": ...}
+    dtype: storage type of the results, the systems always calculate in float64
+    cash_flow: CashFlow, yearly deposits/withdrawals
+    depletion: if given, filled with the year in which each sample ran out of money, see run_batch_years
+    """
+    # All samples are evaluated at once: one system with a balance per sample
+    samples = np.asarray(samples)
     balances = {}
-    for yearly_returns in samples:
-        system = system_cls(start_amount)
 
-        for year, r in enumerate(yearly_returns):
-            system.do_year(r)
-            balances.setdefault(year + 1, []).append(system.netto_balance)
+    system = system_cls(np.full(len(samples), start_amount, dtype=np.float64))
+    system.compile_schedule(samples.shape[1])
+    flow = cash_flow.compile(samples.shape[1]) if cash_flow is not None else None
+
+    run_batch_years(system, samples, range(samples.shape[1]), balances, taxes, dtype, flow, depletion=depletion)
 
     return balances
 
-def run_with_samples_with_switch(system_cls_first, system_cls_second, start_amount, samples):
+def run_with_samples_with_switch(system_cls_first, system_cls_second, start_amount, samples, taxes=None, dtype=np.float64, cash_flow=None,
+                                 depletion=None):
+    """
+    taxes: see run_with_samples, the tax payed includes the tax payed in the first system
+    """
+    samples = np.asarray(samples)
     balances = {}
 
-    for yearly_returns in samples:
-        year = 0
-        system_first = system_cls_first(start_amount)
-        for r in yearly_returns[:2]:
-            system_first.do_year(r)
-            year += 1
-            balances.setdefault(year, []).append(system_first.netto_balance)
+    system_first = system_cls_first(np.full(len(samples), start_amount, dtype=np.float64))
+    system_first.compile_schedule(samples.shape[1])
+    flow = cash_flow.compile(samples.shape[1]) if cash_flow is not None else None
 
-        system_second = system_cls_second(system_first.netto_balance)
+    active, flow = run_batch_years(system_first, samples, range(2), balances, taxes, dtype, flow, depletion=depletion)
 
-        for r in yearly_returns[2:]:
-            system_second.do_year(r)
-            year += 1
-            balances.setdefault(year, []).append(system_second.netto_balance)
+    system_second = system_cls_second(system_first.netto_balance)
+    system_second.compile_schedule(samples.shape[1])
+    if active is not None:
+        # Samples depleted before the switch are not in the second system
+        system_second.params = system_second.params.select(active)
+    # Schedules use simulation years, also after the switch
+    system_second.year = 2
 
-    return balances
+    # Tax payed continues after the switch; the second system starts with the netto balance, so the latent tax
+    # of the first system is payed at the switch
+    tax_offset = None
+    if taxes is not None:
+        tax_offset = taxes["payed"][2].astype(np.float64) + taxes["latent"][2]
+
+    run_batch_years(system_second, samples, range(2, samples.shape[1]), balances, taxes, dtype, flow, active, tax_offset,
+                    depletion)
 
+    return balances
 
+def run_systems(systems: dict, start_amount, samples, dtype=np.float64, cash_flow=None, with_taxes=False):
+    """
+    systems: {name: (system_cls,)}, or {name: (system_cls_first, system_cls_second)} to switch after 2 years
+    with_taxes: also collect the tax series (only needed for the export), otherwise taxes is None
+    Returns balances, taxes, and the depletion year of each sample per system (0 = never; None without cash-flow)
+    """
+    balances = {}
+    taxes = {} if with_taxes else None
+    # Only withdrawals can deplete a sample
+    depletion = {} if cash_flow is not None else None
+
+    for name, system_cls in systems.items():
+        runner = run_with_samples if len(system_cls) == 1 else run_with_samples_with_switch
+        system_taxes = taxes.setdefault(name, {}) if with_taxes else None
+        system_depletion = None
+        if depletion is not None:
+            system_depletion = depletion[name] = np.zeros(len(samples), dtype=np.int32)
+        balances[name] = runner(*system_cls, start_amount, samples, system_taxes, dtype, cash_flow, system_depletion)
+
+    return balances, taxes, depletion
+
+def get_float32_error(systems: dict, reference_samples, balances, step, cash_flow=None):
+    """
+    Relative error of the float32 results against a float64 run, on every `step`-th sample
+    """
+    reference, _, _ = run_systems(systems, START_BALANCE, reference_samples, cash_flow=cash_flow)
+    errors = []
+
+    for name, yearly in reference.items():
+        years = sorted(yearly)
+        expected = np.array([yearly[y] for y in years])
+        actual = np.array([balances[name][y][::step] for y in years], dtype=np.float64)
+
+        rel_error = np.abs(actual - expected) / np.maximum(np.abs(expected), 1.0)
+        errors.append({"Name" : name, "max rel. error" : rel_error.max(), "mean rel. error" : rel_error.mean()})
+
+    return pd.DataFrame(errors)
+
+def run_scenario(systems: dict, samples, dtype=np.float64, cash_flow=None, with_taxes=False, reference=None):
+    """
+    Run all systems, returns balances, taxes, depletion (see run_systems) and the float32 error (None without reference)
+    samples: stored as dtype
+    reference: (step, float64 samples of every step-th sample), see get_reference_samples
+    """
+    balances, taxes, depletion = run_systems(systems, START_BALANCE, samples, dtype, cash_flow, with_taxes)
+
+    if reference is None:
+        return balances, taxes, depletion, None
+
+    step, reference_samples = reference
+    return balances, taxes, depletion, get_float32_error(systems, reference_samples, balances, step, cash_flow)
+
+def get_peak_rss():
+    """
+    Peak resident set size of this process in MB, None if not available
+    """
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+def print_run_summary(dtype=np.float64, errors=None):
+    print("\n=== Run summary ===")
+    print(f"Storage: {np.dtype(dtype).name}")
+
+    if errors is not None:
+        print("Relative error against float64:")
+        print(errors.to_markdown(index=False, floatfmt=".2e"))
+
+    peak_rss = get_peak_rss()
+    if peak_rss is not None:
+        print(f"Peak RSS: {peak_rss:,.1f} MB")
 
 
 def run_years(label, system : TaxSystem, years):
 
+    system.compile_schedule(years)
+
     for i in range(1, years + 1):
         system.do_year(0.10)
 
@@ -180,6 +397,28 @@ def run_years(label, system : TaxSystem, years):
     print("")
 
 
+def box2_kostprijs(s):
+    return Box2(s, s, kostprijs_waarderen=True)
+
+def box2_vpb(s):
+    return Box2(s, s, kostprijs_waarderen=False)
+
+TRANSITION_SYSTEMS = {
+    'Market': (Market,),
+    'Box 3 26 > Box 3 28': (Box3_2026, Box3_2028),
+    'Savings Acc > Box 2': (FixedInterest, box2_kostprijs),
+    'Box 3 26 > Box 2': (Box3_2026, box2_kostprijs),
+    'Box 2 Kostprijs': (box2_kostprijs,),
+}
+
+LONG_TERM_SYSTEMS = {
+    'Market': (Market,),
+    'Box 3 2026': (Box3_2026,),
+    'Box 3 2028': (Box3_2028,),
+    'Box 2 VPB': (box2_vpb,),
+    'Box 2 Kostprijs': (box2_kostprijs,),
+}
+
 def run_years_static(start):
 
     for year in SPANS:
@@ -191,7 +430,7 @@ def run_years_static(start):
         run_years("Box 2 kostprijs", Box2(start, start, kostprijs_waarderen=True), year)
 
 
-def main(mode, market_data_file, max_years, ath_percentage):
+def main(mode, market_data_file, max_years, ath_percentage, export_dir=None, float32=False, cash_flow=None):
 
     df = pd.read_csv(market_data_file, delimiter=";")
     df['Date'] = df['Date'].apply(lambda t: pd.Timestamp(f"{t:.2f}"))
@@ -205,17 +444,14 @@ def main(mode, market_data_file, max_years, ath_percentage):
     print(f"      ATH: {rnd(len(df[ df['Pct Below ATH'] == 0]) / 12):3} years")
 
     max_year = min(max_years, max(SPANS))
+    dtype = np.float32 if float32 else np.float64
+    errors = None
 
     if mode == 'transition':
 
-        samples = get_rolling_returns(df, max_year, ath_percentage)
-
-        balances = {}
-        balances['Market'] = run_with_samples(Market, START_BALANCE, samples)
-        balances['Box 3 26 > Box 3 28'] = run_with_samples_with_switch(Box3_2026, Box3_2028, START_BALANCE, samples)
-        balances['Savings Acc > Box 2'] = run_with_samples_with_switch(FixedInterest, lambda s: Box2(s, s, kostprijs_waarderen=True), START_BALANCE, samples)
-        balances['Box 3 26 > Box 2'] = run_with_samples_with_switch(Box3_2026, lambda s: Box2(s, s, kostprijs_waarderen=True), START_BALANCE, samples)
-        balances['Box 2 Kostprijs'] = run_with_samples(lambda s: Box2(s, s, kostprijs_waarderen=True), START_BALANCE, samples)
+        samples, provenance = get_rolling_returns(df, max_year, ath_percentage, dtype)
+        reference = get_reference_samples(df, provenance, max_year) if float32 else None
+        balances, taxes, depletion, errors = run_scenario(TRANSITION_SYSTEMS, samples, dtype, cash_flow, bool(export_dir), reference)
 
 
         for year in SPANS:
@@ -231,26 +467,31 @@ def main(mode, market_data_file, max_years, ath_percentage):
                 res.update(get_statistics(balance[year], START_BALANCE, year))
                 statistics.append(res)
 
-                # index_min = min(range(len(balance[year])), key=balance[year].__getitem__)
-                # print(f"{k:20} MIN:", samples[index_min])
-
             print(pd.DataFrame(statistics).to_markdown(index=False))
             print("*Compound Annual Growth Rate (CAGR)")
             print(winrate_matrix(balances, year))
+            print(f"\nWorst {TAIL_PATHS} paths:")
+            print(get_tail_table(balances, samples, provenance, year, depletion).to_markdown(index=False))
 
         plot_median_balances(balances, "Tax systems", f"output/transition_{max_year}yrs_{rnd(START_BALANCE/1000)}k.pdf")
         plot_median_with_min_max(balances, "Tax systems", f"output/transition_{max_year}yrs_{rnd(START_BALANCE/1000)}k_itv.pdf")
 
-    elif mode == 'long_term':
+        if export_dir:
+            export_results(export_dir, balances, taxes, samples, provenance, depletion=depletion, dtype=dtype, metadata={
+                "mode": mode,
+                "data": str(market_data_file),
+                "max_year": max_year,
+                "ath_percentage": ath_percentage,
+                "start_balance": START_BALANCE,
+                "cash_flow": cash_flow and {"entries": cash_flow.entries, "indexation": cash_flow.indexation},
+            })
+            print(f"Results exported to {export_dir}")
 
-        samples = get_rolling_returns(df, max_year, ath_percentage)
+    elif mode == 'long_term':
 
-        balances = {}
-        balances['Market'] = run_with_samples(Market, START_BALANCE, samples)
-        balances['Box 3 2026'] = run_with_samples(Box3_2026, START_BALANCE, samples)
-        balances['Box 3 2028'] = run_with_samples(Box3_2028, START_BALANCE, samples)
-        balances['Box 2 VPB'] = run_with_samples(lambda s: Box2(s, s, kostprijs_waarderen=False), START_BALANCE, samples)
-        balances['Box 2 Kostprijs'] = run_with_samples(lambda s: Box2(s, s, kostprijs_waarderen=True), START_BALANCE, samples)
+        samples, provenance = get_rolling_returns(df, max_year, ath_percentage, dtype)
+        reference = get_reference_samples(df, provenance, max_year) if float32 else None
+        balances, taxes, depletion, errors = run_scenario(LONG_TERM_SYSTEMS, samples, dtype, cash_flow, bool(export_dir), reference)
 
 
         for year in SPANS:
@@ -269,13 +510,28 @@ def main(mode, market_data_file, max_years, ath_percentage):
             print(pd.DataFrame(statistics).to_markdown(index=False))
             print("*Compound Annual Growth Rate (CAGR)")
             print(winrate_matrix(balances, year))
+            print(f"\nWorst {TAIL_PATHS} paths:")
+            print(get_tail_table(balances, samples, provenance, year, depletion).to_markdown(index=False))
 
         plot_median_balances(balances, "Tax systems", f"output/long_term_comparison_{max_year}yrs_{rnd(START_BALANCE/1000)}k.pdf")
         plot_median_with_min_max(balances, "Tax systems", f"output/long_term_comparison_{max_year}yrs_{rnd(START_BALANCE/1000)}k_itv.pdf")
 
+        if export_dir:
+            export_results(export_dir, balances, taxes, samples, provenance, depletion=depletion, dtype=dtype, metadata={
+                "mode": mode,
+                "data": str(market_data_file),
+                "max_year": max_year,
+                "ath_percentage": ath_percentage,
+                "start_balance": START_BALANCE,
+                "cash_flow": cash_flow and {"entries": cash_flow.entries, "indexation": cash_flow.indexation},
+            })
+            print(f"Results exported to {export_dir}")
+
     elif mode == 'static':
         run_years_static(START_BALANCE)
 
+    print_run_summary(dtype, errors)
+
 
 if __name__ == '__main__':
     arg_parser = argparse.ArgumentParser(description='Dutch Wealth-tax simulation')
@@ -283,9 +539,21 @@ if __name__ == '__main__':
     arg_parser.add_argument("-d", "--data", help="market_data csv", required=True)
     arg_parser.add_argument("-y", "--max-years", help="max number of years to run", default=50, type=int)
     arg_parser.add_argument("-a", "--ath-percentage", help="if set, only include start-points within given ATH percentage (default=100)", default=100, type=int)
+    arg_parser.add_argument("-o", "--export", help="if set, export samples, balances and taxes to given directory", default=None)
+    arg_parser.add_argument("--float32", help="low-memory mode: store samples and results as float32", action="store_true")
+    arg_parser.add_argument("-c", "--cash-flow", help="yearly deposit, negative for a withdrawal (default=0)", default=0, type=float)
+    arg_parser.add_argument("--cash-flow-indexation", help="yearly indexation of the cash-flow in percent (default=0)", default=0, type=float)
+    arg_parser.add_argument("--cash-flow-percentage", help="yearly cash-flow as percentage of the netto balance, negative for a withdrawal (default=0)", default=0, type=float)
     args = arg_parser.parse_args()
 
     if args.ath_percentage > 100 or args.ath_percentage < 0:
         print("Invalid ATH percentage: Give number between 0 and 100")
 
-    main(args.mode, args.data, args.max_years, args.ath_percentage)
+    cash_flow = None
+    if args.cash_flow or args.cash_flow_percentage:
+        cash_flow = CashFlow(
+            {0: {"amount": args.cash_flow, "percentage": args.cash_flow_percentage / 100}},
+            indexation=args.cash_flow_indexation / 100,
+        )
+
+    main(args.mode, args.data, args.max_years, args.ath_percentage, args.export, args.float32, cash_flow)
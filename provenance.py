@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+# Where a sample comes from: historical start date and its distance to the ATH,
+# or the seed of the generator for synthetic paths (-1 for historical samples)
+PROVENANCE_DTYPE = np.dtype([
+    ("start_date", "datetime64[D]"),
+    ("pct_below_ath", np.float64),
+    ("seed", np.int64),
+])
+
+
+def make_provenance(start_dates, pct_below_ath=None, seeds=None):
+    n = len(start_dates)
+    provenance = np.empty(n, dtype=PROVENANCE_DTYPE)
+
+    provenance["start_date"] = np.asarray(start_dates, dtype="datetime64[D]")
+    provenance["pct_below_ath"] = np.nan if pct_below_ath is None else pct_below_ath
+    provenance["seed"] = -1 if seeds is None else seeds
+
+    return provenance
+
+
+def get_top_k(values, k, worst=True):
+    """
+    Indices of the k lowest (worst=True) or highest values along the last axis, worst/best first.
+    Uses partial selection, only the k selected values are sorted.
+    """
+    if k < 0:
+        raise ValueError(f"k must be >= 0, got {k}")
+
+    values = np.asarray(values)
+    n = values.shape[-1]
+    k = min(k, n)
+
+    if k == 0:
+        return np.empty(values.shape[:-1] + (0,), dtype=np.intp)
+
+    if worst:
+        idx = np.argpartition(values, k - 1, axis=-1)[..., :k]
+    else:
+        idx = np.argpartition(values, n - k, axis=-1)[..., n - k:]
+
+    selected = np.take_along_axis(values, idx, axis=-1)
+    order = np.argsort(selected if worst else -selected, axis=-1, kind="stable")
+
+    return np.take_along_axis(idx, order, axis=-1)
+
+
+def get_ranking(balance, depletion=None, year=None):
+    """
+    Values to rank the paths by after `year` years: the balance, or for paths depleted by then (see
+    run_batch_years, 0 = never) a negative value, lower the earlier the depletion. So depleted paths are the worst,
+    earliest first, instead of ranking arbitrarily on their balance of 0.
+    """
+    balance = np.asarray(balance, dtype=np.float64)
+    if depletion is None:
+        return balance
+
+    depletion = np.asarray(depletion)
+    depleted = (depletion > 0) & (depletion <= year)
+    return np.where(depleted, depletion - (year + 1.0), balance)
+
+
+def describe(provenance, indices) -> pd.DataFrame:
+    """
+    Provenance of the given samples as a table
+    """
+    selected = provenance[np.asarray(indices)]
+
+    table = pd.DataFrame({
+        "sample" : np.asarray(indices),
+        "start" : selected["start_date"].astype(str),
+        "% below ATH" : np.round(selected["pct_below_ath"] * 100, 1),
+        "seed" : selected["seed"],
+    })
+
+    # Historical samples have no seed
+    if (table["seed"] < 0).all():
+        table = table.drop(columns="seed")
+
+    return table
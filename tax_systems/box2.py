@@ -1,4 +1,7 @@
 # box2.py
+import numpy as np
+
+from .schedule import Schedule
 from .tax_system import TaxSystem
 
 # VPB tarieven 2026
@@ -14,45 +17,65 @@ BOX2_SCHIJF_GRENS = 68_843
 
 DIVIDEND_YIELD = 0.015  # 1.5% default
 
+SCHEDULE = Schedule(
+    {
+        0: {
+            "vpb_tarief_laag": VPB_TARIEF_LAAG,
+            "vpb_tarief_hoog": VPB_TARIEF_HOOG,
+            "vpb_schijf_grens": VPB_SCHIJF_GRENS,
+            "box2_tarief_laag": BOX2_TARIEF_LAAG,
+            "box2_tarief_hoog": BOX2_TARIEF_HOOG,
+            "box2_schijf_grens": BOX2_SCHIJF_GRENS,
+            "dividend_yield": DIVIDEND_YIELD,
+        },
+    },
+    indexed=("vpb_schijf_grens", "box2_schijf_grens"),
+)
+
 class Box2(TaxSystem):
 
+    __slots__ = ("agio_balance", "kostprijs_waarderen", "loss_carry_forward", "total_dividend", "total_tax_dividend",
+                 "total_tax_vpb", "total_tax_box2")
+
+    schedule = SCHEDULE
+
     agio_balance : int
     kostprijs_waarderen : bool
 
     loss_carry_forward : int
     total_dividend : int
     total_tax_dividend : int
+    total_tax_vpb : int
+    total_tax_box2 : int
 
-    def __init__(self, start_amount, of_which_agio, kostprijs_waarderen: bool = False):
+    def __init__(self, start_amount, of_which_agio, kostprijs_waarderen: bool = False, schedule: Schedule = None):
         """
         agio_storting: bedrag dat (onbelast) in de BV is gestort bovenop nominale kapitaal.
         kostprijs_waarderen: als True -> VPB wordt niet jaarlijks betaald, maar alleen bij 'verkoop'/uitdeling (kostprijswaardering).
         """
 
-        super().__init__(start_amount)
+        super().__init__(start_amount, schedule)
 
-        self.agio_balance = float(of_which_agio)
+        self.agio_balance = np.asarray(of_which_agio, dtype=float)
         self.kostprijs_waarderen = bool(kostprijs_waarderen)
 
         self.loss_carry_forward = 0.0
         self.total_dividend = 0
         self.total_tax_dividend = 0
+        self.total_tax_vpb = 0.0
+        self.total_tax_box2 = 0.0
 
         self.__recalculate_balances(self.balance)
 
 
     def _get_tax_vpb(self, profit):
         # We assume always the lowest tariff
-        if profit <= 0:
-            return 0.0
-        return profit * VPB_TARIEF_LAAG
+        return np.maximum(profit, 0.0) * self.params.vpb_tarief_laag[self.year]
 
     def _get_tax_box2(self, bruto_balance: float) -> float:
         # We assume we can always payout in lowest tariff
-        taxable = bruto_balance - self.agio_balance
-        if taxable <= 0:
-            return 0.0
-        return taxable * BOX2_TARIEF_LAAG
+        taxable = np.maximum(bruto_balance - self.agio_balance, 0.0)
+        return taxable * self.params.box2_tarief_laag[self.year]
 
         # if distrib_amount <= BOX2_SCHIJF_GRENS:
         #     tax += distrib_amount * BOX2_TARIEF_LAAG
@@ -72,7 +95,7 @@ class Box2(TaxSystem):
             tax_vpb = self._get_tax_vpb(profit)
 
             self.bruto_balance = self.balance - tax_vpb
-            self.bruto_tax_payed = tax_vpb + self.total_tax_dividend
+            self.bruto_tax_payed = tax_vpb + self.total_tax_dividend + self.total_tax_vpb
 
         else:
             # VPB has already been payed
@@ -80,7 +103,7 @@ class Box2(TaxSystem):
 
         tax_box2 = self._get_tax_box2(self.bruto_balance)
 
-        self.netto_tax_payed = tax_box2
+        self.netto_tax_payed = tax_box2 + self.total_tax_box2
         self.netto_balance = self.bruto_balance - tax_box2
 
 
@@ -92,7 +115,7 @@ class Box2(TaxSystem):
 
         if self.kostprijs_waarderen:
             # Only subtract tax payed on dividends
-            dividend = start_balance * DIVIDEND_YIELD
+            dividend = start_balance * self.params.dividend_yield[self.year]
             tax_dividend =  self._get_tax_vpb(dividend)
 
             new_balance -= tax_dividend
@@ -100,26 +123,66 @@ class Box2(TaxSystem):
             self.total_tax_dividend += tax_dividend
 
         else:
-            taxable = profit
-
-            if profit <= 0:
-                # voeg het verlies toe aan carry forward (positief bedrag)
-                self.loss_carry_forward += (-profit)
-                taxable = 0
-
-            elif profit <= self.loss_carry_forward:
-                self.loss_carry_forward -= profit
-                taxable = 0
-
-            else:
-                taxable -= self.loss_carry_forward
-                self.loss_carry_forward = 0.0
+            # verlies -> carry forward (positief bedrag), winst -> eerst verrekenen met carry forward
+            taxable = np.maximum(profit - self.loss_carry_forward, 0.0)
+            self.loss_carry_forward = np.maximum(self.loss_carry_forward - profit, 0.0)
 
             tax = self._get_tax_vpb(taxable)
             # subtract tax from balance
             new_balance -= tax
             self.bruto_tax_payed += tax
 
-        self.year += 1
+        self._next_year()
         self.__recalculate_balances(new_balance)
         return
+
+
+    def get_tax_payed(self):
+        # Kostprijswaardering: VPB over dividend en verkopen, anders de jaarlijkse VPB; plus box 2 over uitkeringen
+        vpb = self.total_tax_dividend + self.total_tax_vpb if self.kostprijs_waarderen else self.bruto_tax_payed
+        return vpb + self.total_tax_box2
+
+
+    def do_cash_flow(self, amount):
+        """
+        Storting: als agio, verhoogt ook de kostprijs.
+        Onttrekking: het netto bedrag dat de aandeelhouder ontvangt, zoals in de andere systemen. Uit de BV gaat
+        het bruto bedrag: eerst terugbetaling van agio (onbelast), de rest als dividend in box 2. Met
+        kostprijswaardering wordt over het verkochte deel van de ongerealiseerde winst eerst VPB betaald.
+        """
+        deposit = np.maximum(amount, 0.0)
+        netto_withdrawal = np.maximum(-amount, 0.0)
+
+        self.agio_balance = self.agio_balance + deposit
+        self.start_amount = self.start_amount + deposit
+
+        # Bruto uitkering zodat na box 2 het netto bedrag overblijft, agio gaat eerst (onbelast)
+        agio_part = np.minimum(netto_withdrawal, self.agio_balance)
+        withdrawal = agio_part + (netto_withdrawal - agio_part) / (1 - self.params.box2_tarief_laag[self.year])
+
+        if self.kostprijs_waarderen:
+            # Bruto verkoop zodat na VPB over de gerealiseerde winst de uitkering overblijft
+            unrealized = np.maximum(self.balance - self.start_amount - self.total_dividend, 0.0)
+            profit_ratio = unrealized / np.where(self.balance > 0, self.balance, 1.0)
+            withdrawal = withdrawal / (1 - profit_ratio * self.params.vpb_tarief_laag[self.year])
+
+        # Niet meer dan er in de BV zit
+        withdrawal = np.minimum(withdrawal, self.balance)
+
+        tax_vpb = 0.0
+        if self.kostprijs_waarderen:
+            # Verkoop realiseert naar rato de ongerealiseerde winst, daarover wordt nu VPB betaald
+            share = withdrawal / np.where(self.balance > 0, self.balance, 1.0)
+            unrealized = self.balance - self.start_amount - self.total_dividend
+
+            tax_vpb = self._get_tax_vpb(unrealized * share)
+            self.start_amount = self.start_amount * (1 - share)
+            self.total_dividend = self.total_dividend * (1 - share)
+            self.total_tax_vpb = self.total_tax_vpb + tax_vpb
+
+        payout = withdrawal - tax_vpb
+        agio_repaid = np.minimum(payout, self.agio_balance)
+        self.agio_balance = self.agio_balance - agio_repaid
+        self.total_tax_box2 = self.total_tax_box2 + (payout - agio_repaid) * self.params.box2_tarief_laag[self.year]
+
+        self.__recalculate_balances(self.balance + deposit - withdrawal)
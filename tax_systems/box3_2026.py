@@ -1,3 +1,6 @@
+import numpy as np
+
+from .schedule import Schedule
 from .tax_system import TaxSystem
 
 # Tarieven 2026
@@ -5,25 +8,41 @@ FORFAITAIR_RENDEMENT = 0.06
 BELASTING_TARIEF = 0.36
 BELASTING_VRIJE_VOET = 59_357
 
+SCHEDULE = Schedule(
+    {
+        0: {
+            "forfaitair_rendement": FORFAITAIR_RENDEMENT,
+            "belasting_tarief": BELASTING_TARIEF,
+            "belasting_vrije_voet": BELASTING_VRIJE_VOET,
+        },
+    },
+    indexed=("belasting_vrije_voet",),
+)
+
 class Box3_2026(TaxSystem):
 
-    def __init__(self, start_amount):
-        super().__init__(start_amount)
+    __slots__ = ()
+
+    schedule = SCHEDULE
+
+    def __init__(self, start_amount, schedule: Schedule = None):
+        super().__init__(start_amount, schedule)
 
 
     def do_year(self, interest):
 
+        params = self.params
         profit = self._get_profit(self.balance, interest)
 
-        taxable = max(0, self.balance - BELASTING_VRIJE_VOET)
-        profit_fictief = taxable * FORFAITAIR_RENDEMENT
+        taxable = np.maximum(0, self.balance - params.belasting_vrije_voet[self.year])
+        profit_fictief = taxable * params.forfaitair_rendement[self.year]
 
         # Tegenbewijsregeling
-        profit_werkelijk = max(0, profit)
+        profit_werkelijk = np.maximum(0, profit)
 
         # Kies laagste rendement
-        taxable_profit = min(profit_fictief, profit_werkelijk)
-        tax = taxable_profit * BELASTING_TARIEF
+        taxable_profit = np.minimum(profit_fictief, profit_werkelijk)
+        tax = taxable_profit * params.belasting_tarief[self.year]
 
         new_balance = self.balance + profit - tax
 
@@ -34,7 +53,7 @@ class Box3_2026(TaxSystem):
         self.bruto_tax_payed += tax
         self.netto_tax_payed += tax
 
-        self.year += 1
+        self._next_year()
 
         # print(f"Year: {self.year:2,} Profit: {int(profit):6,} Tax: {int(tax):6,} Balance: {int(self.balance):8,}")
 
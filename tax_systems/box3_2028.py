@@ -1,44 +1,58 @@
+import numpy as np
+
+from .schedule import Schedule
 from .tax_system import TaxSystem
 
 BELASTING_TARIEF = 0.36
 HEFFINGSVRIJ = 1800
+VERLIES_DREMPEL = 500
+
+SCHEDULE = Schedule(
+    {
+        0: {
+            "belasting_tarief": BELASTING_TARIEF,
+            "heffingsvrij": HEFFINGSVRIJ,
+            "verlies_drempel": VERLIES_DREMPEL,
+        },
+    },
+    indexed=("heffingsvrij", "verlies_drempel"),
+)
 
 
 class Box3_2028(TaxSystem):
 
-    loss_carry_forward = 0.0
+    __slots__ = ("loss_carry_forward",)
+
+    schedule = SCHEDULE
+
+    loss_carry_forward : float
 
-    def __init__(self, start_amount):
-        super().__init__(start_amount)
+    def __init__(self, start_amount, schedule: Schedule = None):
+        super().__init__(start_amount, schedule)
+
+        self.loss_carry_forward = 0.0
 
 
     def do_year(self, interest):
 
+        params = self.params
         profit = self._get_profit(self.balance, interest)
 
-        if profit < 0:
-            tax = 0
-
-            # verlies -> carry forward (mits > 500)
-            loss = -profit
-            if loss > 500:
-                self.loss_carry_forward += (loss - 500)
-
-        else:
-            # winst: eerst compenseer carry-forward
-            taxable = profit - HEFFINGSVRIJ - self.loss_carry_forward
-            if taxable < 0:
-                # nog niet genoeg winst om vrijstelling + verlies eruit te halen
-                tax = 0
-                if self.loss_carry_forward > profit:
-                    self.loss_carry_forward -= profit
-                else:
-                    self.loss_carry_forward = 0
-
-            else:
-                tax = taxable * BELASTING_TARIEF
-                # reset carry-forward
-                self.loss_carry_forward = 0
+        # verlies -> carry forward (mits > drempel)
+        loss = np.maximum(-profit, 0)
+        new_loss = np.maximum(loss - params.verlies_drempel[self.year], 0)
+
+        # winst: eerst compenseer carry-forward
+        taxable = profit - params.heffingsvrij[self.year] - self.loss_carry_forward
+        tax = np.maximum(taxable, 0) * params.belasting_tarief[self.year]
+
+        self.loss_carry_forward = np.where(
+            profit < 0,
+            self.loss_carry_forward + new_loss,
+            # nog niet genoeg winst om vrijstelling + verlies eruit te halen -> verlies deels verrekend,
+            # anders reset carry-forward
+            np.where(taxable < 0, np.maximum(self.loss_carry_forward - profit, 0), 0),
+        )
 
         new_balance = self.balance + profit - tax
 
@@ -49,7 +63,7 @@ class Box3_2028(TaxSystem):
         self.bruto_tax_payed += tax
         self.netto_tax_payed += tax
 
-        self.year += 1
+        self._next_year()
 
         # print(f"Year: {self.year:2,} Profit: {int(profit):6,} Tax: {int(tax):6,} Balance: {int(self.balance):8,}")
 
@@ -0,0 +1,33 @@
+from .schedule import Schedule
+
+
+class CashFlow(Schedule):
+    """
+    Yearly deposit (positive) or withdrawal (negative), made at the start of each year:
+        amount + percentage * netto balance
+    Like any schedule, entries can change per year, e.g. deposits until year 30 and withdrawals after that.
+    """
+
+    def __init__(self, entries: dict, indexation=0.0, indexed=("amount",)):
+        entries = {year: dict(params) for year, params in entries.items()}
+
+        # Year 0 defaults to no cash-flow
+        first = entries.setdefault(0, {})
+        first.setdefault("amount", 0.0)
+        first.setdefault("percentage", 0.0)
+
+        super().__init__(entries, indexation, indexed)
+
+    @classmethod
+    def fixed_amount(cls, amount):
+        return cls({0: {"amount": amount}})
+
+    @classmethod
+    def indexed_amount(cls, amount, inflation):
+        # Amount grows with inflation every year
+        return cls({0: {"amount": amount}}, indexation=inflation)
+
+    @classmethod
+    def percentage_of_balance(cls, percentage):
+        # Fraction of the balance, e.g. -0.04 to withdraw 4% per year
+        return cls({0: {"percentage": percentage}})
@@ -1,3 +1,6 @@
+import numpy as np
+
+from .schedule import Schedule
 from .tax_system import TaxSystem
 
 FORFAITAIR_RENDEMENT = 0.0128
@@ -5,25 +8,42 @@ BELASTING_TARIEF = 0.36
 BELASTING_VRIJE_VOET = 59.357
 INTEREST_RATE = 0.025
 
+SCHEDULE = Schedule(
+    {
+        0: {
+            "forfaitair_rendement": FORFAITAIR_RENDEMENT,
+            "belasting_tarief": BELASTING_TARIEF,
+            "belasting_vrije_voet": BELASTING_VRIJE_VOET,
+            "interest_rate": INTEREST_RATE,
+        },
+    },
+    indexed=("belasting_vrije_voet",),
+)
+
 class FixedInterest(TaxSystem):
 
-    def __init__(self, start_amount):
-        super().__init__(start_amount)
+    __slots__ = ()
+
+    schedule = SCHEDULE
+
+    def __init__(self, start_amount, schedule: Schedule = None):
+        super().__init__(start_amount, schedule)
 
 
     def do_year(self, interest):
 
-        profit = self._get_profit(self.balance, INTEREST_RATE)
+        params = self.params
+        profit = self._get_profit(self.balance, params.interest_rate[self.year])
 
-        taxable = max(0, self.balance - BELASTING_VRIJE_VOET)
-        profit_fictief = taxable * FORFAITAIR_RENDEMENT
+        taxable = np.maximum(0, self.balance - params.belasting_vrije_voet[self.year])
+        profit_fictief = taxable * params.forfaitair_rendement[self.year]
 
         # # Tegenbewijsregeling
-        profit_werkelijk = taxable * interest if interest > 0 else 0
+        profit_werkelijk = taxable * np.maximum(interest, 0)
 
         # # Kies laagste rendement
-        taxable_profit = min(profit_fictief, profit_werkelijk)
-        tax = taxable_profit * BELASTING_TARIEF
+        taxable_profit = np.minimum(profit_fictief, profit_werkelijk)
+        tax = taxable_profit * params.belasting_tarief[self.year]
 
         new_balance = self.balance + profit - tax
 
@@ -34,6 +54,6 @@ class FixedInterest(TaxSystem):
         self.bruto_tax_payed += tax
         self.netto_tax_payed += tax
 
-        self.year += 1
+        self._next_year()
 
         return
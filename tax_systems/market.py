@@ -6,8 +6,10 @@ BELASTING_VRIJE_VOET = 59.357  # 2024, 1 persoon
 
 class Market(TaxSystem):
 
-    def __init__(self, start_amount):
-        super().__init__(start_amount)
+    __slots__ = ()
+
+    def __init__(self, start_amount, schedule=None):
+        super().__init__(start_amount, schedule)
 
 
     def do_year(self, interest):
@@ -20,5 +22,5 @@ class Market(TaxSystem):
         self.bruto_balance = new_balance
         self.netto_balance = new_balance
 
-        self.year += 1
+        self._next_year()
         return
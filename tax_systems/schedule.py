@@ -0,0 +1,106 @@
+import numpy as np
+
+# Number of years a schedule is compiled for by default, the runners compile for the length of the run
+SCHEDULE_YEARS = 100
+
+
+class Parameters:
+    """
+    Compiled schedule: one array per parameter, indexed by year.
+    Use as `params.belasting_tarief[year]`.
+    """
+
+    years : int
+
+    def __init__(self, years, arrays: dict):
+        self.years = years
+        self.arrays = arrays
+        self.__dict__.update(arrays)
+
+    def select(self, mask) -> "Parameters":
+        """
+        Parameters for a subset of the samples, only per-sample arrays (years, samples) are affected.
+        """
+        return Parameters(self.years, {
+            name: array[:, mask] if array.ndim > 1 else array
+            for name, array in self.arrays.items()
+        })
+
+
+class Schedule:
+
+    def __init__(self, entries: dict, indexation=0.0, indexed=()):
+        """
+        entries: {year: {parameter: value}}, year 0 is the first simulated year and must set every parameter.
+                 Years without entry take over the values of the previous entry (forward-fill).
+        indexation: yearly inflation, applied to the `indexed` parameters for every year after they were last set.
+                    Can be an array (one value per sample) to get per-sample parameters.
+        indexed: names of the parameters that are indexed (e.g. vrijstellingen, schijfgrenzen)
+        """
+
+        self.entries = {int(year): dict(params) for year, params in entries.items()}
+        self.indexation = indexation
+        self.indexed = tuple(indexed)
+
+        self.names = sorted({name for params in self.entries.values() for name in params})
+
+        if self.entries and 0 not in self.entries:
+            raise ValueError("Schedule must start at year 0")
+
+        missing = [name for name in self.names if name not in self.entries[0]]
+        if missing:
+            raise ValueError(f"Schedule year 0 does not set: {', '.join(missing)}")
+
+        unknown = [name for name in self.indexed if name not in self.names]
+        if unknown:
+            raise ValueError(f"Unknown indexed parameters: {', '.join(unknown)}")
+
+        self._compiled = {}
+
+    def with_entries(self, entries: dict, indexation=None, indexed=None):
+        """
+        New schedule with the given entries merged over these entries.
+        """
+        merged = {year: dict(params) for year, params in self.entries.items()}
+        for year, params in entries.items():
+            merged.setdefault(int(year), {}).update(params)
+
+        return type(self)(
+            merged,
+            self.indexation if indexation is None else indexation,
+            self.indexed if indexed is None else indexed,
+        )
+
+    def compile(self, years=SCHEDULE_YEARS) -> Parameters:
+        """
+        Compile to per-year arrays; the result is cached, so this is cheap to call per instance.
+        """
+        if years in self._compiled:
+            return self._compiled[years]
+
+        steps = np.arange(years)
+        arrays = {}
+
+        for name in self.names:
+            set_years = np.array(sorted(y for y, params in self.entries.items() if name in params))
+            values = np.array([self.entries[y][name] for y in set_years], dtype=float)
+
+            # index of the last entry at or before each year
+            pos = np.searchsorted(set_years, steps, side="right") - 1
+            array = values[pos]
+
+            if name in self.indexed:
+                indexation = np.asarray(self.indexation, dtype=float)
+
+                # broadcast per-sample values / indexation against the year axis
+                extra = max(array.ndim - 1, indexation.ndim)
+                elapsed = (steps - set_years[pos]).reshape((years,) + (1,) * extra)
+                array = array.reshape(array.shape + (1,) * (extra - array.ndim + 1))
+                array = array * (1 + indexation) ** elapsed
+
+            array.flags.writeable = False
+            arrays[name] = array
+
+        params = Parameters(years, arrays)
+        self._compiled[years] = params
+        return params
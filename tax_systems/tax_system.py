@@ -1,7 +1,17 @@
+import numpy as np
+
+from .schedule import Schedule
 
 
 class TaxSystem:
 
+    # Slotted: no per-instance __dict__, subclasses declare their own state in __slots__
+    __slots__ = ("start_amount", "balance", "bruto_balance", "netto_balance",
+                 "bruto_tax_payed", "netto_tax_payed", "year", "tax_schedule", "params")
+
+    # Default tax parameters, override per instance with `schedule`
+    schedule = Schedule({})
+
     start_amount : int
 
     balance : int
@@ -14,7 +24,11 @@ class TaxSystem:
 
     year : int
 
-    def __init__(self, start_amount):
+    def __init__(self, start_amount, schedule: Schedule = None):
+        """
+        start_amount: scalar, or an array to evaluate all samples at once (batched)
+        schedule: tax parameters per year, defaults to the schedule of the class
+        """
 
         self.start_amount = start_amount
 
@@ -27,6 +41,24 @@ class TaxSystem:
 
         self.year = 0
 
+        self.tax_schedule = self.schedule if schedule is None else schedule
+        self.params = self.tax_schedule.compile()
+
+    def compile_schedule(self, years):
+        """
+        Compile the schedule for a run of `years` years, instead of the default SCHEDULE_YEARS.
+        """
+        # +1: the balances after the last year are valued with the parameters of the next year
+        self.params = self.tax_schedule.compile(years + 1)
+
+    def _next_year(self):
+        self.year += 1
+
+        # Used directly (not through a runner) for longer than compiled for: extend the schedule.
+        # The runners compile for the full run, so per-sample parameters that were selected are kept.
+        if self.year >= self.params.years:
+            self.compile_schedule(2 * self.year)
+
     def _get_profit(self, start_amount, interest):
 
         profit = start_amount * interest
@@ -35,6 +67,41 @@ class TaxSystem:
     def do_year(self, interest):
         pass
 
+    def do_cash_flow(self, amount):
+        """
+        Deposit (positive) or withdrawal (negative) at the start of the year, withdrawals are capped at the balance.
+        A withdrawal is the net amount received; systems that tax withdrawals take out the grossed-up amount.
+        """
+        amount = np.maximum(amount, -self.balance)
+
+        self.balance = self.balance + amount
+        self.bruto_balance = self.balance
+        self.netto_balance = self.balance
+
+    def get_tax_payed(self):
+        """
+        Total tax actually payed so far.
+        """
+        return self.bruto_tax_payed
+
+    def get_latent_tax(self):
+        """
+        Tax that is still due when liquidating now: the difference between balance and netto balance.
+        """
+        return self.balance - self.netto_balance
+
+    def select(self, mask):
+        """
+        Batched evaluation: keep only the samples in `mask`, e.g. to drop depleted paths.
+        """
+        for cls in type(self).__mro__:
+            for name in getattr(cls, "__slots__", ()):
+                value = getattr(self, name, None)
+                if isinstance(value, np.ndarray) and value.ndim > 0:
+                    setattr(self, name, value[mask])
+
+        self.params = self.params.select(mask)
+
 
 
     def get_year_tax(self, start_amount, end_amount) -> int:
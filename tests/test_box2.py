@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+import main
+from tax_systems.box2 import Box2
+from tax_systems.cash_flow import CashFlow
+
+
+def get_received(system, amount):
+    # Net amount received: what left the BV, minus the tax payed on the withdrawal
+    balance = system.balance
+    tax = system.total_tax_vpb + system.total_tax_box2
+    system.do_cash_flow(amount)
+    return balance - system.balance - (system.total_tax_vpb + system.total_tax_box2 - tax)
+
+
+@pytest.mark.parametrize("kostprijs_waarderen", [False, True])
+def test_withdrawal_is_net_amount(kostprijs_waarderen):
+    system = Box2(100_000.0, 20_000.0, kostprijs_waarderen)
+    system.do_year(0.5)
+
+    # First withdrawal is repaid agio, the second is taxed as dividend
+    for _ in range(3):
+        assert get_received(system, -10_000.0) == pytest.approx(10_000.0)
+
+    assert system.agio_balance == pytest.approx(0.0)
+    assert system.total_tax_box2 > 0
+    assert (system.total_tax_vpb > 0) == kostprijs_waarderen
+
+
+def test_withdrawal_capped_at_balance():
+    system = Box2(np.array([10_000.0, 100_000.0]), 0.0, kostprijs_waarderen=True)
+    system.do_year(0.5)
+    system.do_cash_flow(-50_000.0)
+
+    np.testing.assert_allclose(system.balance[0], 0.0, atol=1e-9)
+    assert system.balance[1] > 0
+
+
+@pytest.mark.parametrize("kostprijs_waarderen", [False, True])
+def test_percentage_withdrawal_of_netto_balance(kostprijs_waarderen):
+    system = Box2(np.full(3, 100_000.0), 20_000.0, kostprijs_waarderen)
+    system.do_year(np.array([0.5, 0.1, -0.2]))
+
+    flow = CashFlow.percentage_of_balance(-0.04).compile(2)
+    netto_balance = system.netto_balance
+    balance = system.balance
+    tax_payed = system.get_tax_payed()
+
+    main.run_batch_years(system, np.zeros((3, 2)), range(1, 2), {}, flow=flow)
+
+    # 4% of the netto balance is received, the tax on the withdrawal (and the dividend tax of the year) comes on top
+    received = balance - system.balance - (system.get_tax_payed() - tax_payed)
+    np.testing.assert_allclose(received, 0.04 * netto_balance)
+    assert (netto_balance < balance).all()
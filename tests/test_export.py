@@ -0,0 +1,45 @@
+import numpy as np
+
+import main
+from export import export_results, load_results
+from provenance import make_provenance
+
+
+def test_export_round_trip(tmp_path):
+    n, years = 20, 5
+    samples = np.random.default_rng(0).normal(0.05, 0.2, (n, years)).astype(np.float32)
+    start_dates = np.arange("1950-01-01", n, dtype="datetime64[Y]").astype("datetime64[D]")
+    provenance = make_provenance(start_dates, np.linspace(0, 0.5, n))
+
+    balances, taxes, _ = main.run_systems(main.TRANSITION_SYSTEMS, main.START_BALANCE, samples, np.float32, with_taxes=True)
+    export_results(tmp_path, balances, taxes, samples, provenance, {"mode": "test"}, np.float32)
+
+    results = load_results(tmp_path)
+    systems = list(main.TRANSITION_SYSTEMS)
+
+    assert results.systems == systems
+    assert results.years == years
+    assert results.scenario == {"mode": "test"}
+
+    for series in (results.balances, results.tax_payed, results.latent_tax):
+        assert isinstance(series, np.memmap)
+        assert series.shape == (len(systems), years, n)
+        assert series.dtype == np.float32
+
+    np.testing.assert_array_equal(results.samples, samples)
+    # without cash-flow nothing is depleted
+    assert results.depletion.shape == (len(systems), n)
+    assert not results.depletion.any()
+
+    for name in systems:
+        assert results.balance(name, 3).shape == (n,)
+        np.testing.assert_array_equal(results.balance(name, 3), balances[name][3])
+        np.testing.assert_array_equal(results.balance(name)[years - 1], balances[name][years])
+        np.testing.assert_array_equal(results.tax_payed[results.system_index(name), 0], taxes[name]["payed"][1])
+
+    np.testing.assert_array_equal(results.provenance(), provenance)
+    np.testing.assert_array_equal(results.provenance([1, 3]), provenance[[1, 3]])
+    np.testing.assert_array_equal(results.provenance(3), provenance[[3]])
+
+    worst = results.tail("Market", years, k=3)
+    np.testing.assert_array_equal(worst, np.argsort(balances["Market"][years], kind="stable")[:3])
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from provenance import describe, get_top_k, make_provenance
+
+
+@pytest.mark.parametrize("worst", [True, False])
+@pytest.mark.parametrize("k", [0, 1, 5, 20, 30])
+def test_top_k_matches_argsort(worst, k):
+    # distinct values, so the order is unique
+    values = np.random.default_rng(0).permutation(20).astype(float)
+    expected = np.argsort(values if worst else -values)[:k]
+
+    np.testing.assert_array_equal(get_top_k(values, k, worst), expected)
+
+
+@pytest.mark.parametrize("worst", [True, False])
+def test_top_k_along_last_axis(worst):
+    values = np.random.default_rng(1).random((4, 50))
+    expected = np.argsort(values if worst else -values, axis=-1)[:, :7]
+
+    np.testing.assert_array_equal(get_top_k(values, 7, worst), expected)
+    assert get_top_k(values, 0, worst).shape == (4, 0)
+
+
+def test_top_k_rejects_negative_k():
+    with pytest.raises(ValueError):
+        get_top_k(np.arange(5), -1)
+
+
+def test_describe():
+    start_dates = np.array(["1929-09-01", "2000-03-01", "2008-01-01"], dtype="datetime64[D]")
+    provenance = make_provenance(start_dates, [0.0, 0.123, 0.5])
+
+    table = describe(provenance, get_top_k(np.array([3.0, 1.0, 2.0]), 2))
+
+    assert list(table["sample"]) == [1, 2]
+    assert list(table["start"]) == ["2000-03-01", "2008-01-01"]
+    assert list(table["% below ATH"]) == [12.3, 50.0]
+    # historical samples: no seed column
+    assert "seed" not in table
+
+    synthetic = describe(make_provenance(start_dates, seeds=[7, 8, 9]), [2])
+    assert list(synthetic["seed"]) == [9]
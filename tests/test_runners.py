@@ -0,0 +1,108 @@
+import numpy as np
+
+import main
+from provenance import make_provenance
+from tax_systems.box3_2026 import Box3_2026
+from tax_systems.box3_2028 import Box3_2028, SCHEDULE
+from tax_systems.cash_flow import CashFlow
+from tax_systems.market import Market
+
+
+def run_scalar(system_cls_first, system_cls_second, start_amount, returns, cash_flows):
+    # Reference: one sample at a time, switching after 2 years
+    system = system_cls_first(start_amount)
+    system.compile_schedule(len(returns))
+    balances = []
+
+    for year, r in enumerate(returns):
+        if year == 2:
+            system = system_cls_second(system.netto_balance)
+            system.compile_schedule(len(returns))
+            system.year = 2
+
+        system.do_cash_flow(cash_flows[year])
+        if system.balance <= 0:
+            return balances + [0.0] * (len(returns) - year)
+
+        system.do_year(r)
+        balances.append(float(system.netto_balance))
+
+    return balances
+
+
+def test_switch_with_per_sample_schedule_and_depleted_samples():
+    n, years = 200, 10
+    rng = np.random.default_rng(0)
+    samples = rng.normal(0.05, 0.3, (n, years))
+    indexation = rng.uniform(0, 0.04, n)
+    # Large withdrawals deplete some samples before the switch
+    cash_flow = CashFlow.fixed_amount(np.where(np.arange(n) % 2 == 0, -48_000, -1_000))
+
+    balances = main.run_with_samples_with_switch(
+        Box3_2026, lambda s: Box3_2028(s, SCHEDULE.with_entries({}, indexation=indexation)),
+        100_000, samples, cash_flow=cash_flow,
+    )
+
+    # Some samples are depleted before the switch, some survive it
+    assert (balances[2] == 0).any()
+    assert (balances[years] > 0).any()
+
+    flow = cash_flow.compile(years)
+    for i in range(n):
+        schedule = SCHEDULE.with_entries({}, indexation=indexation[i])
+        expected = run_scalar(Box3_2026, lambda s: Box3_2028(s, schedule), 100_000.0, samples[i], flow.amount[:, i])
+        actual = [balances[year][i] for year in range(1, years + 1)]
+        np.testing.assert_allclose(actual, expected, rtol=1e-12)
+
+
+def test_float32_scenario():
+    n, years = 300, 20
+    samples = np.random.default_rng(1).normal(0.06, 0.18, (n, years))
+    step = 3
+
+    balances, taxes, _, errors = main.run_scenario(
+        main.LONG_TERM_SYSTEMS, samples.astype(np.float32), np.float32, with_taxes=True, reference=(step, samples[::step]),
+    )
+
+    assert list(errors["Name"]) == list(main.LONG_TERM_SYSTEMS)
+    # float32 samples and storage: a small, but non-zero error against the float64 reference
+    assert (errors["max rel. error"] > 0).all()
+    assert (errors["max rel. error"] < 1e-5).all()
+
+    for name in main.LONG_TERM_SYSTEMS:
+        assert all(balances[name][year].dtype == np.float32 for year in range(1, years + 1))
+        assert all(taxes[name][kind][years].dtype == np.float32 for kind in ("payed", "latent"))
+
+
+def test_depleted_paths_rank_worst_earliest_first():
+    n, years = 50, 10
+    samples = np.random.default_rng(2).normal(0.05, 0.1, (n, years))
+    provenance = make_provenance(np.full(n, "2000-01-01", dtype="datetime64[D]"))
+    # A few samples run out of money, in different years
+    amounts = np.full(n, -1_000.0)
+    amounts[[5, 17, 30]] = [-30_000.0, -60_000.0, -40_000.0]
+
+    balances, _, depletion = main.run_systems(
+        {"Market": (Market,), "Box 3 26 > Box 3 28": (Box3_2026, Box3_2028)}, 100_000, samples,
+        cash_flow=CashFlow.fixed_amount(amounts),
+    )
+
+    for name, yearly in balances.items():
+        depleted = np.flatnonzero(depletion[name])
+        assert set(depleted) == {5, 17, 30}
+
+        # the depletion year is the first year that ends with nothing left
+        for i in depleted:
+            assert yearly[depletion[name][i] - 1][i] > 0
+            assert yearly[depletion[name][i]][i] == 0
+
+    table = main.get_tail_table(balances, samples, provenance, years, depletion, k=4)
+    market = table[table["Name"] == "Market"]
+    expected = sorted(depleted, key=lambda i: depletion["Market"][i])
+
+    assert list(market["sample"][:3]) == expected
+    assert list(market["depleted"][:3]) == sorted(depletion["Market"][expected])
+    assert market["depleted"].iloc[3] == ""
+
+    best = main.get_tail_table(balances, samples, provenance, years, depletion, k=n - 3, worst=False)
+    assert not set(best["sample"]) & {5, 17, 30}
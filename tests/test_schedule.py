@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from tax_systems.cash_flow import CashFlow
+from tax_systems.schedule import Schedule
+
+
+def test_forward_fill():
+    params = Schedule({0: {"a": 1, "b": 2}, 3: {"a": 5}}).compile(6)
+
+    assert params.years == 6
+    np.testing.assert_array_equal(params.a, [1, 1, 1, 5, 5, 5])
+    np.testing.assert_array_equal(params.b, [2] * 6)
+
+
+def test_indexation_restarts_at_last_set_year():
+    params = Schedule({0: {"a": 100, "b": 1}, 3: {"a": 200}}, indexation=0.1, indexed=("a",)).compile(6)
+
+    np.testing.assert_allclose(params.a, [100, 110, 121, 200, 220, 242])
+    np.testing.assert_array_equal(params.b, [1] * 6)
+
+
+def test_per_sample_indexation():
+    schedule = Schedule({0: {"a": 100, "b": 1}}, indexation=np.array([0.0, 0.1]), indexed=("a",))
+    params = schedule.compile(3)
+
+    assert params.a.shape == (3, 2)
+    np.testing.assert_allclose(params.a[:, 0], [100, 100, 100])
+    np.testing.assert_allclose(params.a[:, 1], [100, 110, 121])
+
+    # not indexed -> shared by all samples
+    assert params.b.shape == (3,)
+
+
+def test_compile_is_cached_and_read_only():
+    schedule = Schedule({0: {"a": 1}})
+    params = schedule.compile(4)
+
+    assert schedule.compile(4) is params
+    with pytest.raises(ValueError):
+        params.a[0] = 2
+
+
+def test_with_entries():
+    schedule = Schedule({0: {"a": 100, "b": 1}}, indexation=0.1, indexed=("a",))
+    changed = schedule.with_entries({2: {"b": 2}})
+
+    np.testing.assert_allclose(changed.compile(3).a, [100, 110, 121])
+    np.testing.assert_array_equal(changed.compile(3).b, [1, 1, 2])
+
+    # the original is unchanged
+    assert schedule.entries == {0: {"a": 100, "b": 1}}
+
+    np.testing.assert_allclose(schedule.with_entries({}, indexation=0.0).compile(3).a, [100, 100, 100])
+
+
+def test_with_entries_keeps_type():
+    flow = CashFlow.fixed_amount(-1000).with_entries({5: {"amount": -2000}})
+
+    assert isinstance(flow, CashFlow)
+    assert flow.compile(6).amount[5] == -2000
+
+
+@pytest.mark.parametrize("entries, indexed", [
+    ({1: {"a": 1}}, ()),
+    ({0: {"a": 1}, 2: {"b": 1}}, ()),
+    ({0: {"a": 1}}, ("b",)),
+])
+def test_invalid_schedule(entries, indexed):
+    with pytest.raises(ValueError):
+        Schedule(entries, indexed=indexed)
+
+
+def test_parameters_select():
+    params = Schedule({0: {"a": 100, "b": 1}}, indexation=np.array([0.0, 0.1, 0.2]), indexed=("a",)).compile(3)
+    selected = params.select(np.array([True, False, True]))
+
+    assert selected.years == 3
+    np.testing.assert_array_equal(selected.a, params.a[:, [0, 2]])
+    assert selected.b is params.b
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from tax_systems.box2 import Box2
+from tax_systems.box3_2026 import Box3_2026
+from tax_systems.box3_2028 import Box3_2028, SCHEDULE as BOX3_2028_SCHEDULE
+from tax_systems.schedule import SCHEDULE_YEARS
+
+
+@pytest.mark.parametrize("make_system", [
+    lambda: Box2(1e5, 1e5, True),
+    lambda: Box2(1e5, 1e5, False),
+    lambda: Box3_2026(1e5),
+    lambda: Box3_2028(1e5, BOX3_2028_SCHEDULE.with_entries({}, indexation=0.02)),
+])
+def test_used_directly_beyond_default_horizon(make_system):
+    system = make_system()
+    for _ in range(SCHEDULE_YEARS + 50):
+        system.do_year(0.01)
+
+    assert system.year == SCHEDULE_YEARS + 50
+    assert system.params.years > system.year
+    assert np.isfinite(system.netto_balance)
+
+
+# Reference implementations of the original scalar branches, per sample
+
+def box2_vpb_reference(balance, agio, returns):
+    lcf = 0.0
+    netto = []
+    for interest in returns:
+        profit = balance * interest
+        taxable = profit
+
+        if profit <= 0:
+            lcf += -profit
+            taxable = 0
+        elif profit <= lcf:
+            lcf -= profit
+            taxable = 0
+        else:
+            taxable -= lcf
+            lcf = 0.0
+
+        balance += profit - (taxable * 0.19 if taxable > 0 else 0.0)
+        netto.append(balance - max(balance - agio, 0) * 0.245)
+
+    return netto
+
+
+def box3_2028_reference(balance, returns):
+    lcf = 0.0
+    netto = []
+    for interest in returns:
+        profit = balance * interest
+
+        if profit < 0:
+            tax = 0
+            if -profit > 500:
+                lcf += -profit - 500
+        else:
+            taxable = profit - 1800 - lcf
+            if taxable < 0:
+                tax = 0
+                lcf = lcf - profit if lcf > profit else 0
+            else:
+                tax = taxable * 0.36
+                lcf = 0
+
+        balance += profit - tax
+        netto.append(balance)
+
+    return netto
+
+
+def mixed_returns(n, years):
+    # Large gains/losses and small results around the thresholds
+    rng = np.random.default_rng(1)
+    returns = rng.normal(0.03, 0.2, (n, years))
+    small = rng.uniform(-0.02, 0.03, (n, years))
+    return np.where(rng.random((n, years)) < 0.5, returns, small)
+
+
+@pytest.mark.parametrize("make_system, reference", [
+    (lambda start: Box2(start, 5e4, False), lambda start, returns: box2_vpb_reference(start, 5e4, returns)),
+    (lambda start: Box3_2028(start), box3_2028_reference),
+])
+def test_loss_carry_forward_matches_scalar_reference(make_system, reference):
+    start, n, years = 1e5, 50, 30
+    returns = mixed_returns(n, years)
+    expected = np.array([reference(start, returns[i]) for i in range(n)])
+
+    # batched
+    system = make_system(np.full(n, start))
+    for year in range(years):
+        system.do_year(returns[:, year])
+        np.testing.assert_allclose(system.netto_balance, expected[:, year], rtol=1e-12)
+
+    # scalar
+    for i in range(5):
+        system = make_system(start)
+        for year in range(years):
+            system.do_year(returns[i, year])
+        np.testing.assert_allclose(system.netto_balance, expected[i, -1], rtol=1e-12)